@@ -12,3 +12,8 @@ max_pbs_num = 5000
 max_pbs_age = 30
 '''maximum age in days of PBS files in PBS_DIR'''
 
+max_partition_imbalance = 1.25
+'''maximum ratio of the largest partition to the balanced partition size
+for which JobChain.partition keeps connected components whole'''
+partition_poll = 0.05
+'''seconds between checks for a scheduler ID submitted by another worker'''
@@ -244,6 +244,17 @@ class TORQUE(Job):
 
         return self.dependents
 
+    def __getstate__( self ):
+        '''
+        Pickle each dependency as the internal ID of the job it points to
+        instead of the Job itself, so that pickling one job does not pickle
+        everything upstream of it. After unpickling, get_deps() holds
+        [ uuid, type ] entries until the caller relinks them to Jobs.
+        '''
+        state = self.__dict__.copy()
+        state['dependents'] = [ [ dep[0].get_id(), dep[1] ] for dep in self.dependents ]
+        return state
+
     def submit( self, dry_run = False, stdout=None, stderr=None ):
         """
         Submit the job to the scheduler.
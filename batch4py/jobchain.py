@@ -1,7 +1,10 @@
 import subprocess
 import uuid
 from collections import defaultdict
+from multiprocessing import Manager, Pool
+import time
 from .job import Job
+from . import constants
 import os
 
 __author__ = 'Landon T. Clipp'
@@ -153,24 +156,169 @@ class JobChain(object):
         return stack
 
     #====================================================================   
-    def submit( self, print_map=False, **kwargs ):
+    def partition( self, num_parts=None ):
+        '''
+**DESCRIPTION**  
+    Split self's graph into partitions that can be submitted by separate
+    processes. Each partition lists its Jobs in topological order.  
+
+    If *num_parts* is None, the graph is split into its weakly connected
+    components. No dependency crosses a partition boundary.  
+
+    Otherwise, the components are packed into at most *num_parts*
+    partitions, largest component first into the smallest partition. If
+    that leaves the largest partition more than
+    constants.max_partition_imbalance times the balanced size, the graph
+    is instead cut into balanced partitions, even across a connected
+    component. Jobs are then placed greedily in topological order: each
+    Job goes to the partition, among those not yet full, that already
+    holds the most of its dependencies (weighted by how empty the
+    partition is), or to the least loaded partition if none do. This
+    keeps the number of dependencies crossing a partition boundary low.  
+**ARGUMENTS**  
+    *num_parts* (int)   -- Maximum number of partitions to return. If None,
+        every connected component is returned as its own partition.  
+**EFFECTS**  
+    None  
+**RETURN**  
+    List of partitions, where each partition is a list of Job objects.
+        '''
+        if num_parts is not None and num_parts < 1:
+            raise ValueError("Argument 'num_parts' must be at least 1.")
+
+        components = self._components()
+        if num_parts is None or not components:
+            return components
+
+        # Ceiling division
+        cap = -( -self._num_vert // num_parts )
+
+        # Longest-processing-time-first: hand the largest remaining component
+        # to the currently smallest partition. Components share no edges, so
+        # concatenating them keeps each partition in topological order.
+        parts = [ [] for i in range( min( num_parts, len( components ) ) ) ]
+        for comp in sorted( components, key=len, reverse=True ):
+            min( parts, key=len ).extend( comp )
+
+        if max( len( part ) for part in parts ) <= cap * constants.max_partition_imbalance:
+            return parts
+
+        return self._cut( num_parts, cap )
+
+    #====================================================================   
+    def _cut( self, num_parts, cap ):
+        '''
+**DESCRIPTION**  
+    Cut self's graph into at most *num_parts* partitions of at most *cap*
+    Jobs each. See partition().  
+**ARGUMENTS**  
+    *num_parts* (int)   -- Maximum number of partitions.  
+    *cap* (int)         -- Maximum number of Jobs in a partition.  
+**EFFECTS**  
+    None  
+**RETURN**  
+    List of partitions, each a list of Job objects in topological order.
+        '''
+        parts = [ [] for i in range( num_parts ) ]
+        owner = {}
+
+        for job in self.topo_sort():
+            # Number of job's dependencies already placed in each partition.
+            # Topological order guarantees all of them have been placed.
+            num_deps = defaultdict(int)
+            for dep in job.get_deps():
+                num_deps[ owner[ dep[0] ] ] += 1
+
+            best = None
+            best_key = None
+            for i, part in enumerate( parts ):
+                if len( part ) >= cap:
+                    continue
+                key = ( num_deps[i] * ( 1 - len( part ) / cap ), -len( part ) )
+                if best_key is None or key > best_key:
+                    best = i
+                    best_key = key
+
+            parts[ best ].append( job )
+            owner[ job ] = best
+
+        return [ part for part in parts if part ]
+
+    #====================================================================   
+    def _components( self ):
+        '''
+**DESCRIPTION**  
+    Split self's graph into its weakly connected components.  
+**ARGUMENTS**  
+    None  
+**EFFECTS**  
+    None  
+**RETURN**  
+    List of components, where each component is a list of Job objects in
+    topological order.
+        '''
+        # Union-find over the dependency edges, ignoring edge direction.
+        parent = {}
+        for job in self._job_list:
+            parent[ job ] = job
+
+        def find( job ):
+            while parent[ job ] is not job:
+                parent[ job ] = parent[ parent[ job ] ]
+                job = parent[ job ]
+            return job
+
+        for job in self._job_list:
+            for dep in job.get_deps():
+                if dep[0] not in parent:
+                    raise RuntimeError("Dependency on a job that has not been added to JobChain!")
+                root_a = find( job )
+                root_b = find( dep[0] )
+                if root_a is not root_b:
+                    parent[ root_b ] = root_a
+
+        # Group jobs by component, preserving topological order.
+        components = defaultdict(list)
+        for job in self.topo_sort():
+            components[ find( job ) ].append( job )
+
+        return list( components.values() )
+
+    #====================================================================   
+    def submit( self, print_map=False, processes=None, **kwargs ):
         '''
 **DESCRIPTION**  
     Submits all Jobs added by add_job() to the system scheduler.  
 **ARGUMENTS**  
     *print_map* (bool)  -- Return a string representation of the job
         dependency map.
+    *processes* (int)   -- If greater than 1, cut the chain into at most
+        this many partitions with partition() and submit each partition
+        from its own worker process. Scheduler IDs of dependencies that
+        cross partitions are passed between the workers. If the chain
+        yields only one partition, jobs are submitted serially. kwargs
+        must be picklable, so file objects cannot be passed for
+        stdout/stderr.
     *kwargs* -- keyword arguments to each individual job.submit() call.  
 **EFFECTS**  
-    Submits jobs to the scheduler.  
+    Submits jobs to the scheduler. If a submission fails, every job that
+    was submitted before the failure keeps its scheduler ID.  
 **RETURN**  
     If print_map == True: string  
     If print_map == False: None
         '''    
         sort_jobs = self.topo_sort()
-        for job in sort_jobs:
-            job.submit( **kwargs )
-            print('submitting job: {}'.format( job.get_id() ) ) 
+
+        parts = []
+        if processes is not None and processes > 1:
+            parts = self.partition( processes )
+
+        if len( parts ) > 1:
+            self._submit_parallel( parts, **kwargs )
+        else:
+            for job in sort_jobs:
+                job.submit( **kwargs )
+                print('submitting job: {}'.format( job.get_id() ) ) 
         
         if print_map:
             map_str = '' 
@@ -185,5 +333,146 @@ class JobChain(object):
             
             return map_str
 
+    #====================================================================   
+    def _submit_parallel( self, parts, **kwargs ):
+        '''
+**DESCRIPTION**  
+    Submit each partition from a separate worker process. Workers publish
+    the scheduler ID of every job they submit in a shared dict, from which
+    workers holding dependent jobs read it. Workers operate on copies of
+    the Jobs, so the scheduler IDs they obtain are copied back onto self's
+    Jobs afterwards.  
 
-        
+    All partitions run at the same time, one worker each, so a worker
+    waiting on another partition can never starve it of a process.  
+
+    If a submission fails, that job and every job depending on it,
+    directly or not, is abandoned. The worker whose submission failed
+    abandons the rest of its partition, like the serial loop does. Other
+    workers keep submitting every job that does not depend on an
+    abandoned job. Once all workers are done, the first error is
+    re-raised.  
+**ARGUMENTS**  
+    *parts* (list of list of Job)   -- Partitions as returned by
+        partition( num_parts ), each in topological order.  
+    *kwargs* -- keyword arguments to each individual job.submit() call.  
+**EFFECTS**  
+    Submits jobs to the scheduler. Sets the scheduler ID of every Job that
+    was submitted.  
+**RETURN**  
+    None
+        '''
+        jobs = { job.get_id() : job for job in self._job_list }
+
+        with Manager() as manager:
+            sched_ids = manager.dict()
+
+            # Jobs pickle their dependencies as internal IDs (see
+            # TORQUE.__getstate__), so each worker only receives its own
+            # partition rather than everything upstream of it.
+            with Pool( len( parts ) ) as pool:
+                pending = [ pool.apply_async( _submit_partition, 
+                    ( part, kwargs, sched_ids ) ) for part in parts ]
+                results = [ res.get() for res in pending ]
+
+        error = None
+        for ids, err in results:
+            for job_id, sched_id in ids:
+                jobs[ job_id ].set_sched_id( sched_id )
+            if error is None:
+                error = err
+
+        if error is not None:
+            raise error
+
+#========================================================================
+class _ExternalJob(object):
+    '''Stand-in for a dependency that another worker submits.'''
+
+    def __init__( self, id ):
+        self._id = id
+        self._sched_id = None
+
+    def get_id( self ):
+        return self._id
+
+    def set_sched_id( self, id ):
+        self._sched_id = id
+
+    def get_sched_id( self ):
+        return self._sched_id
+
+#========================================================================
+def _submit_partition( jobs, kwargs, sched_ids ):
+    '''
+**DESCRIPTION**  
+    Worker function for JobChain._submit_parallel. Submits one partition
+    of Jobs in topological order. Before submitting a job that depends on
+    a job in another partition, waits until that job shows up in
+    *sched_ids*. A job whose dependency was abandoned is abandoned too.  
+**ARGUMENTS**  
+    *jobs* (list of Job)    -- Partition in topological order, whose
+        dependencies are internal IDs as left by unpickling.  
+    *kwargs* (dict)         -- keyword arguments to each job.submit() call.  
+    *sched_ids* (dict)      -- Shared dict mapping internal ID to scheduler
+        ID for every job finished so far by any worker. The scheduler ID
+        is None if the job was abandoned.  
+**EFFECTS**  
+    Submits jobs to the scheduler. Adds every job of the partition to
+    *sched_ids*.  
+**RETURN**  
+    Tuple of ( list of ( internal ID, scheduler ID ) tuples for the jobs
+    submitted, exception raised by a failed submission or None ).
+    '''
+    # Relink dependencies to Jobs of this partition, or to stand-ins for
+    # Jobs of other partitions.
+    local = { job.get_id() : job for job in jobs }
+    external = {}
+    for job in jobs:
+        for dep in job.get_deps():
+            if dep[0] in local:
+                dep[0] = local[ dep[0] ]
+            else:
+                dep[0] = external.setdefault( dep[0], _ExternalJob( dep[0] ) )
+
+    # Scheduler IDs of the jobs this worker has seen, None if abandoned
+    known = {}
+    submitted = []
+
+    try:
+        for job in jobs:
+            abandon = False
+            for dep in job.get_deps():
+                dep_id = dep[0].get_id()
+                if dep_id not in known:
+                    # Only jobs of other partitions can be unknown here
+                    while dep_id not in sched_ids:
+                        time.sleep( constants.partition_poll )
+                    known[ dep_id ] = sched_ids[ dep_id ]
+                    if known[ dep_id ] is not None:
+                        dep[0].set_sched_id( known[ dep_id ] )
+
+                if known[ dep_id ] is None:
+                    abandon = True
+                    break
+
+            if abandon:
+                known[ job.get_id() ] = None
+                sched_ids[ job.get_id() ] = None
+                continue
+
+            job.submit( **kwargs )
+            print('submitting job: {}'.format( job.get_id() ) ) 
+
+            known[ job.get_id() ] = job.get_sched_id()
+            sched_ids[ job.get_id() ] = job.get_sched_id()
+            submitted.append( ( job.get_id(), job.get_sched_id() ) )
+
+    except Exception as e:
+        # Abandon the rest of the partition so no other worker waits on it
+        for job_id in local:
+            if job_id not in known:
+                sched_ids[ job_id ] = None
+        return submitted, e
+
+    return submitted, None
@@ -67,3 +67,123 @@ class TestJobTORQUE(object):
             'beforeok', 'beforenotok' ]
         for i in depends:
             job1.depends( job2, i )
+
+SCRIPT = os.path.join( os.path.dirname(__file__), 'batch.pbs' )
+
+class FailingTORQUE( batch4py.job.TORQUE ):
+    '''TORQUE job whose submission always fails, as if qsub returned nonzero.'''
+    def submit( self, dry_run = False, stdout=None, stderr=None ):
+        raise RuntimeError('Process exited with retcode 1')
+
+def make_chain( jobs, deps ):
+    '''
+    Return a JobChain holding jobs, where deps is a list of
+    ( base, target ) index pairs into jobs.
+    '''
+    chain = batch4py.JobChain()
+    for job in jobs:
+        chain.add_job( job )
+    for base, target in deps:
+        chain.set_dep( jobs[base], jobs[target], 'afterany' )
+    return chain
+
+def make_fan( num_leaves ):
+    '''
+    Return ( chain, jobs ) for a setup job (jobs[0]) fanning out to
+    num_leaves jobs that all feed a reduce job (jobs[-1]).
+    '''
+    jobs = [ batch4py.job.TORQUE( SCRIPT ) for i in range( num_leaves + 2 ) ]
+    deps = []
+    for i in range( 1, num_leaves + 1 ):
+        deps.append( ( i, 0 ) )
+        deps.append( ( num_leaves + 1, i ) )
+    return make_chain( jobs, deps ), jobs
+
+class TestJobChain(object):
+    def test_partition( self ):
+        jobs = [ batch4py.job.TORQUE( SCRIPT ) for i in range(5) ]
+        chain = make_chain( jobs, [ (1, 0), (2, 1), (4, 3) ] )
+
+        parts = chain.partition()
+        assert len( parts ) == 2
+        assert sorted( len(p) for p in parts ) == [2, 3]
+
+        # Components balance well enough, so they are kept whole
+        packed = chain.partition( 2 )
+        assert len( packed ) == 2
+        assert all( set( p ) in [ set( q ) for q in parts ] for p in packed )
+
+        assert len( chain.partition( 1 ) ) == 1
+
+        with pytest.raises( ValueError ):
+            chain.partition( 0 )
+
+    def test_partition_cut( self ):
+        chain, jobs = make_fan( 6 )
+
+        assert len( chain.partition() ) == 1
+
+        parts = chain.partition( 3 )
+        assert len( parts ) == 3
+        assert sorted( len(p) for p in parts ) == [2, 3, 3]
+        assert sum( len(p) for p in parts ) == 8
+
+        # Every partition lists its jobs in topological order
+        sort_jobs = chain.topo_sort()
+        for part in parts:
+            assert part == sorted( part, key=sort_jobs.index )
+
+    def test_submit_parallel( self ):
+        jobs = [ batch4py.job.TORQUE( SCRIPT ) for i in range(4) ]
+        chain = make_chain( jobs, [ (1, 0), (3, 2) ] )
+
+        chain.submit( processes=2, dry_run=True )
+        for job in jobs:
+            assert job.get_sched_id() == str( job.get_id() )
+
+    def test_submit_parallel_empty( self ):
+        chain = batch4py.JobChain()
+        assert chain.submit( print_map=True, processes=2, dry_run=True ) == ''
+
+    def test_submit_parallel_single_job( self ):
+        job = batch4py.job.TORQUE( SCRIPT )
+        chain = make_chain( [job], [] )
+
+        chain.submit( processes=4, dry_run=True )
+        assert job.get_sched_id() == str( job.get_id() )
+
+    def test_submit_parallel_connected( self ):
+        chain, jobs = make_fan( 6 )
+
+        map_str = chain.submit( print_map=True, processes=3, dry_run=True )
+        for job in jobs:
+            assert job.get_sched_id() == str( job.get_id() )
+            assert 'ID: {}'.format( job.get_sched_id() ) in map_str
+        assert map_str.count( 'afterany {}'.format( jobs[0].get_sched_id() ) ) == 6
+
+    def test_submit_parallel_long_chain( self ):
+        jobs = [ batch4py.job.TORQUE( SCRIPT ) for i in range(500) ]
+        chain = make_chain( jobs, [ (i + 1, i) for i in range(499) ] )
+
+        chain.submit( processes=2, dry_run=True )
+        for job in jobs:
+            assert job.get_sched_id() == str( job.get_id() )
+
+    def test_submit_parallel_failure( self ):
+        jobs = [ batch4py.job.TORQUE( SCRIPT ), FailingTORQUE( SCRIPT ) ] + \
+            [ batch4py.job.TORQUE( SCRIPT ) for i in range(3) ]
+        good, bad, after_good, after_bad, after_after_bad = jobs
+        chain = make_chain( jobs, [ (2, 0), (3, 1), (4, 3) ] )
+
+        # Every job lands in its own partition, so the jobs after the
+        # failing one wait on it from other workers.
+        assert len( chain.partition( 5 ) ) == 5
+
+        with pytest.raises( RuntimeError ):
+            chain.submit( processes=5, dry_run=True )
+
+        for job in [good, after_good]:
+            assert job.get_sched_id() == str( job.get_id() )
+        for job in [bad, after_bad, after_after_bad]:
+            with pytest.raises( RuntimeError ):
+                job.get_sched_id()